@@ -1,6 +1,5 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi import APIRouter, Depends, HTTPException, status, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.security import create_access_token
@@ -11,7 +10,8 @@ router = APIRouter()
 
 @router.post("/api/v1/auth/token", response_model=Token)
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(),
+    username: str = Form(...),
+    password: str = Form(...),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -20,7 +20,7 @@ async def login_for_access_token(
     """
     # 在实际应用中，这里应该验证用户名和密码
     # 简化版实现，直接使用用户名作为user_id
-    user_id = form_data.username
+    user_id = username
     
     if not user_id:
         raise HTTPException(
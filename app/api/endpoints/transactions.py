@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
-from app.crud import get_transactions_by_user, update_transaction, delete_transaction, get_transaction_by_id, create_transaction
+from app.crud import get_transactions_by_user, update_transaction, delete_transaction, create_transaction
 from app.schemas import TransactionInDB, TransactionUpdate, TransactionCreate
 from app.security import get_current_user
 from datetime import datetime
@@ -61,23 +61,15 @@ async def update_user_transaction(
 ):
     """修改记录"""
     try:
-        # 检查交易是否存在且属于当前用户
-        existing_transaction = await get_transaction_by_id(db, transaction_id, user_id)
-        if not existing_transaction:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Transaction not found or access denied"
-            )
-        
-        # 更新交易
+        # 更新交易，未找到记录或不属于当前用户时返回None
         updated_transaction = await update_transaction(
             db, transaction_id, transaction_update, user_id
         )
         
         if not updated_transaction:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to update transaction"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transaction not found or access denied"
             )
         
         return updated_transaction
@@ -97,21 +89,13 @@ async def delete_user_transaction(
 ):
     """删除记录"""
     try:
-        # 检查交易是否存在且属于当前用户
-        existing_transaction = await get_transaction_by_id(db, transaction_id, user_id)
-        if not existing_transaction:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Transaction not found or access denied"
-            )
-        
-        # 删除交易
+        # 删除交易，未找到记录或不属于当前用户时返回False
         success = await delete_transaction(db, transaction_id, user_id)
         
         if not success:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to delete transaction"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transaction not found or access denied"
             )
         
         return {"status": "success", "message": "Transaction deleted successfully"}
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, Response
 from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any, Optional
+from redis.asyncio import Redis
+from typing import Dict, Any, Optional, Callable, Awaitable
 from app.database import get_db
-from app.services.wecom_service import wecom_service
+from app.cache import get_redis
+from app.services.wecom_service import get_wecom_service
 from app.services.image_recognition_service import image_recognition_service
 from app.crud import create_transaction
 from app.schemas import TransactionCreate
@@ -12,11 +14,50 @@ from app.security import create_access_token
 from datetime import datetime, timedelta
 import json
 import logging
-from urllib.parse import unquote
+import time
+import aiofiles
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 已处理消息ID的Redis键前缀及过期时间（秒），用于消息去重
+PROCESSED_MESSAGE_KEY = "wecom:msg:{msg_id}"
+PROCESSED_MESSAGE_TTL = 86400
+
+# 待确认交易的Redis键前缀及过期时间（秒）
+# 格式: List，表头为最新的交易，元素为 {"timestamp": ..., "data": transaction_data} 的JSON
+PENDING_TRANSACTION_KEY = "wecom:pending:{user_id}"
+PENDING_TRANSACTION_TTL = 86400
+
+# 符合企业微信要求的XML响应模板
+XML_RESPONSE_TEMPLATE = """<xml>
+<Encrypt><![CDATA[%s]]></Encrypt>
+<MsgSignature><![CDATA[%s]]></MsgSignature>
+<TimeStamp>%s</TimeStamp>
+<Nonce><![CDATA[%s]]></Nonce>
+</xml>"""
+
+# 文本指令回复内容
+MENU_TEXT = "请选择您需要的服务：\n1. 发送图片进行记账\n2. 查看账本\n3. 访问后台管理\n4. 帮助\n\n请回复对应数字或直接发送图片"
+
+HELP_TEXT = "使用帮助：\n1. 发送包含消费信息的收据图片，系统将自动识别并记账\n2. 识别后会发送确认信息，回复'确认'或'取消'\n3. 回复'菜单'可查看所有可用功能\n4. 如有问题请联系管理员"
+
+# 回调的固定响应内容
+STATIC_RESPONSES = {
+    "success": {"status": "success"},
+    "duplicate": {"status": "success", "message": "Message already processed"},
+    "unsupported": {"status": "unsupported message type"},
+}
+
+def get_encrypted_response(name: str) -> str:
+    """加密固定响应内容，密文包含随机串、时间戳和nonce，每次响应都需重新加密"""
+    return get_wecom_service().encrypt_message(STATIC_RESPONSES[name])
+
+def build_xml_response(encrypted_response: str, msg_signature: str, timestamp: str, nonce: str) -> Response:
+    """构建企业微信XML响应"""
+    xml_response = XML_RESPONSE_TEMPLATE % (encrypted_response, msg_signature, timestamp, nonce)
+    return Response(content=xml_response, media_type="application/xml")
+
 @router.get("/api/v1/wecom/callback")
 async def verify_callback_url(
     request: Request,
@@ -27,19 +68,6 @@ async def verify_callback_url(
 ):
     """用于企业微信服务器验证URL"""
     try:
-        # 获取查询参数
-        query_params = request.query_params
-        
-        # 如果参数为空，尝试从查询参数中获取
-        if not msg_signature:
-            msg_signature = query_params.get("msg_signature")
-        if not timestamp:
-            timestamp = query_params.get("timestamp")
-        if not nonce:
-            nonce = query_params.get("nonce")
-        if not echostr:
-            echostr = query_params.get("echostr")
-        
         # 检查必需参数
         if not all([msg_signature, timestamp, nonce, echostr]):
             # 记录缺少的参数
@@ -54,22 +82,17 @@ async def verify_callback_url(
                 missing_params.append("echostr")
             
             logger.error(f"Missing required parameters: {missing_params}")
-            logger.error(f"All query params: {dict(query_params)}")
+            logger.error(f"All query params: {dict(request.query_params)}")
             
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Missing required parameters: {', '.join(missing_params)}"
             )
         
-        # 对收到的请求做Urldecode处理
-        msg_signature = unquote(msg_signature)
-        timestamp = unquote(timestamp)
-        nonce = unquote(nonce)
-        echostr = unquote(echostr)
-        
+        # 查询参数已由框架完成URL解码，无需再做Urldecode处理
         # 使用企业微信官方库验证URL并解密echostr
         # 注意：这里不再需要单独调用verify_url方法，因为decrypt_echostr方法已经包含了验证逻辑
-        msg = wecom_service.decrypt_echostr(msg_signature, timestamp, nonce, echostr)
+        msg = get_wecom_service().decrypt_echostr(msg_signature, timestamp, nonce, echostr)
         
         if msg:
             return PlainTextResponse(content=msg)
@@ -93,21 +116,11 @@ async def handle_wecom_message(
     msg_signature: Optional[str] = Query(None, alias="msg_signature"),
     timestamp: Optional[str] = Query(None, alias="timestamp"),
     nonce: Optional[str] = Query(None, alias="nonce"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis)
 ):
     """接收用户消息，处理图片消息并启动记账流程"""
     try:
-        # 获取查询参数
-        query_params = request.query_params
-        
-        # 如果参数为空，尝试从查询参数中获取
-        if not msg_signature:
-            msg_signature = query_params.get("msg_signature")
-        if not timestamp:
-            timestamp = query_params.get("timestamp")
-        if not nonce:
-            nonce = query_params.get("nonce")
-        
         # 检查必需参数
         if not all([msg_signature, timestamp, nonce]):
             # 记录缺少的参数
@@ -120,52 +133,31 @@ async def handle_wecom_message(
                 missing_params.append("nonce")
             
             logger.error(f"Missing required parameters: {missing_params}")
-            logger.error(f"All query params: {dict(query_params)}")
+            logger.error(f"All query params: {dict(request.query_params)}")
             
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Missing required parameters: {', '.join(missing_params)}"
             )
         
-        # 对收到的请求做Urldecode处理
-        msg_signature = unquote(msg_signature)
-        timestamp = unquote(timestamp)
-        nonce = unquote(nonce)
-        
-        # 获取请求体
-        body = await request.body()
+        # 获取请求体（查询参数已由框架完成URL解码）
+        body_str = (await request.body()).decode('utf-8')
         
         # 解密消息 - 传递msg_signature, timestamp, nonce参数给decrypt_message方法
-        message_data = wecom_service.decrypt_message(body.decode('utf-8'), msg_signature, timestamp, nonce)
+        message_data = get_wecom_service().decrypt_message(body_str, msg_signature, timestamp, nonce)
         
         # 检查消息类型
         msg_type = message_data.get("MsgType")
         
-        # 消息去重检查
+        # 消息去重检查，SET NX 成功表示首次处理，过期由Redis负责
         msg_id = message_data.get("MsgId")
-        if msg_id and msg_id in processed_messages:
+        if msg_id and not await redis.set(
+            PROCESSED_MESSAGE_KEY.format(msg_id=msg_id), "1", ex=PROCESSED_MESSAGE_TTL, nx=True
+        ):
             # 如果消息已处理过，直接返回成功响应，避免重复处理
             logger.info(f"消息已处理过，跳过重复处理: msg_id={msg_id}")
-            response_data = {"status": "success", "message": "Message already processed"}
-            encrypted_response = wecom_service.encrypt_message(response_data)
-            # 构建符合企业微信要求的XML响应格式
-            xml_response = f"""<xml>
-<Encrypt><![CDATA[{encrypted_response}]]></Encrypt>
-<MsgSignature><![CDATA[{msg_signature}]]></MsgSignature>
-<TimeStamp>{timestamp}</TimeStamp>
-<Nonce><![CDATA[{nonce}]]></Nonce>
-</xml>"""
-            return Response(content=xml_response, media_type="application/xml")
-        
-        # 记录已处理的消息ID
-        if msg_id:
-            processed_messages[msg_id] = datetime.now().isoformat()
-            # 清理超过24小时的消息ID记录，防止内存泄漏
-            current_time = datetime.now()
-            expired_msgs = [mid for mid, mtime in processed_messages.items() 
-                          if (current_time - datetime.fromisoformat(mtime)).total_seconds() > 86400]
-            for mid in expired_msgs:
-                del processed_messages[mid]
+            encrypted_response = get_encrypted_response("duplicate")
+            return build_xml_response(encrypted_response, msg_signature, timestamp, nonce)
         
         if msg_type == "image":
             # 处理图片消息
@@ -173,33 +165,29 @@ async def handle_wecom_message(
             user_id = message_data.get("FromUserName")
             
             # 下载图片
-            image_data = await wecom_service.download_image(media_id)
+            image_data = await get_wecom_service().download_image(media_id)
             
-            # 保存图片到log文件夹
-            import os
-            import time
+            # 保存图片到log文件夹（目录在应用启动时创建）
             log_dir = "log"
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir)
             
-            # 使用时间戳和用户ID作为文件名
-            timestamp = int(time.time())
-            filename = f"{log_dir}/{user_id}_{timestamp}.jpg"
-            with open(filename, "wb") as f:
-                f.write(image_data)
+            # 使用时间戳和用户ID作为文件名，不覆盖请求的timestamp参数
+            saved_at = int(time.time())
+            filename = f"{log_dir}/{user_id}_{saved_at}.jpg"
+            async with aiofiles.open(filename, "wb") as f:
+                await f.write(image_data)
             logger.info(f"图片已保存到: {filename}")
             
-            # 调用图片识别服务直接获取结构化的记账数据，传递图片路径避免重复保存
-            recognition_result = await image_recognition_service.recognize_text(image_data, filename)
+            # 调用图片识别服务直接获取结构化的记账数据
+            recognition_result = await image_recognition_service.recognize_text(image_data)
             
             # 检查图片识别是否成功
             if not recognition_result.get('success', True):  # 默认为True以兼容旧格式
                 # 图片识别失败，向用户发送错误消息
                 error_msg = recognition_result.get('error', '图片识别失败，无法识别图片中的文本')
-                await wecom_service.send_text_message(user_id, f"识别失败：{error_msg}")
+                await get_wecom_service().send_text_message(user_id, f"识别失败：{error_msg}")
             else:
                 # 检查是否启用了钱迹模式
-                qianji_enabled = getattr(settings, 'QIANJI_ENABLED', False)
+                qianji_enabled = settings.QIANJI_ENABLED
                 
                 if qianji_enabled and recognition_result.get('qianji_enabled', False):
                     # 钱迹模式已启用，直接返回识别结果和钱迹记账链接
@@ -212,9 +200,9 @@ async def handle_wecom_message(
                             message = f"已识别记账信息，请点击链接记账：\n{qianji_url}"
                         else:
                             message = f"已识别记账信息，请点击链接记账（已跳过分类选择）：\n{qianji_url}"
-                        await wecom_service.send_text_message(user_id, message)
+                        await get_wecom_service().send_text_message(user_id, message)
                     else:
-                        await wecom_service.send_text_message(user_id, "识别成功，但生成钱迹记账链接失败，请重试。")
+                        await get_wecom_service().send_text_message(user_id, "识别成功，但生成钱迹记账链接失败，请重试。")
                 else:
                     # 普通模式，走原来的确认流程
                     # OCR识别成功，处理交易数据
@@ -225,97 +213,33 @@ async def handle_wecom_message(
                         transaction_data['transaction_date'] = datetime.now().strftime('%Y-%m-%d')
                     
                     # 保存待确认的交易数据
-                    transaction_timestamp = await save_pending_transaction(user_id, transaction_data)
+                    transaction_timestamp = await save_pending_transaction(redis, user_id, transaction_data)
                     
                     # 添加交易标识到数据中，用于后续确认
                     transaction_data['transaction_id'] = transaction_timestamp
                     
                     # 发送确认卡片
-                    await wecom_service.send_confirmation_card(user_id, transaction_data)
+                    await get_wecom_service().send_confirmation_card(user_id, transaction_data)
             
             # 返回成功响应
-            response_data = {"status": "success"}
-            encrypted_response = wecom_service.encrypt_message(response_data)
-            # 构建符合企业微信要求的XML响应格式
-            xml_response = f"""<xml>
-<Encrypt><![CDATA[{encrypted_response}]]></Encrypt>
-<MsgSignature><![CDATA[{msg_signature}]]></MsgSignature>
-<TimeStamp>{timestamp}</TimeStamp>
-<Nonce><![CDATA[{nonce}]]></Nonce>
-</xml>"""
-            return Response(content=xml_response, media_type="application/xml")
+            encrypted_response = get_encrypted_response("success")
+            return build_xml_response(encrypted_response, msg_signature, timestamp, nonce)
             
         elif msg_type == "text":
             # 处理文本消息
             content = message_data.get("Content")
             user_id = message_data.get("FromUserName")
             
-            # 检查是否是确认消息
-            if content.lower() == "确认" or content.lower() == "confirm":
-                # 获取用户最新的待确认交易
-                if user_id in pending_transactions and pending_transactions[user_id]:
-                    # 获取最新的交易timestamp
-                    latest_timestamp = max(pending_transactions[user_id].keys())
-                    
-                    # 确认交易并保存到数据库
-                    success = await confirm_transaction(user_id, latest_timestamp, db)
-                    
-                    if success:
-                        await wecom_service.send_text_message(user_id, "交易已确认，已记录到账本中。")
-                    else:
-                        await wecom_service.send_text_message(user_id, "确认失败，未找到对应的交易数据。")
-                else:
-                    await wecom_service.send_text_message(user_id, "未找到待确认的交易数据。")
-            elif content.lower() == "取消" or content.lower() == "cancel":
-                # 获取用户最新的待确认交易
-                if user_id in pending_transactions and pending_transactions[user_id]:
-                    # 获取最新的交易timestamp
-                    latest_timestamp = max(pending_transactions[user_id].keys())
-                    
-                    # 从待确认列表中删除
-                    if user_id in pending_transactions and latest_timestamp in pending_transactions[user_id]:
-                        del pending_transactions[user_id][latest_timestamp]
-                        
-                        # 如果用户没有其他待确认交易，删除用户条目
-                        if not pending_transactions[user_id]:
-                            del pending_transactions[user_id]
-                            
-                await wecom_service.send_text_message(user_id, "交易已取消。")
-            elif content == "菜单" or content.lower() == "menu":
-                # 发送菜单选项
-                menu_text = "请选择您需要的服务：\n1. 发送图片进行记账\n2. 查看账本\n3. 访问后台管理\n4. 帮助\n\n请回复对应数字或直接发送图片"
-                await wecom_service.send_text_message(user_id, menu_text)
-            elif content == "1":
-                await wecom_service.send_text_message(user_id, "请发送包含消费信息的收据图片，我将为您自动识别并记账。")
-            elif content == "2":
-                # 这里可以添加查看账本的功能
-                await wecom_service.send_text_message(user_id, "账本查看功能正在开发中，敬请期待。")
-            elif content == "3":
-                # 发送后台管理链接
-                # 为用户生成一个临时token，有效期1小时
-                token_data = {"sub": user_id}
-                access_token = create_access_token(data=token_data, expires_delta=timedelta(hours=1))
-                admin_url = f"{settings.PENETRATE_URL}/token/{access_token}"
-                await wecom_service.send_text_message(user_id, f"后台管理页面：{admin_url}\n\n请使用浏览器打开链接进行管理操作。\n\n注意：链接有效期1小时，请尽快使用。")
-            elif content == "4":
-                help_text = "使用帮助：\n1. 发送包含消费信息的收据图片，系统将自动识别并记账\n2. 识别后会发送确认信息，回复'确认'或'取消'\n3. 回复'菜单'可查看所有可用功能\n4. 如有问题请联系管理员"
-                await wecom_service.send_text_message(user_id, help_text)
+            # 查表分发文本指令，未匹配的内容提示可用选项
+            handler = TEXT_COMMANDS.get((content or "").strip().lower())
+            if handler:
+                await handler(user_id, db, redis)
             else:
-                # 非预设内容，提供选择
-                response_text = f"您发送的消息：'{content}' 不是预设指令。\n\n请选择您需要的操作：\n1. 发送图片进行记账\n2. 查看账本\n3. 访问后台管理\n4. 查看帮助\n\n请回复对应数字或发送'菜单'查看所有选项"
-                await wecom_service.send_text_message(user_id, response_text)
+                await send_unknown_command_reply(user_id, content)
             
             # 返回成功响应
-            response_data = {"status": "success"}
-            encrypted_response = wecom_service.encrypt_message(response_data)
-            # 构建符合企业微信要求的XML响应格式
-            xml_response = f"""<xml>
-<Encrypt><![CDATA[{encrypted_response}]]></Encrypt>
-<MsgSignature><![CDATA[{msg_signature}]]></MsgSignature>
-<TimeStamp>{timestamp}</TimeStamp>
-<Nonce><![CDATA[{nonce}]]></Nonce>
-</xml>"""
-            return Response(content=xml_response, media_type="application/xml")
+            encrypted_response = get_encrypted_response("success")
+            return build_xml_response(encrypted_response, msg_signature, timestamp, nonce)
             
         elif msg_type == "event":
             # 处理事件消息
@@ -327,60 +251,18 @@ async def handle_wecom_message(
                 
                 # 处理卡片点击事件
                 if event_key == "confirm":
-                    # 获取用户最新的待确认交易
-                    if user_id in pending_transactions and pending_transactions[user_id]:
-                        # 获取最新的交易timestamp
-                        latest_timestamp = max(pending_transactions[user_id].keys())
-                        
-                        # 确认交易并保存到数据库
-                        success = await confirm_transaction(user_id, latest_timestamp, db)
-                        
-                        if success:
-                            await wecom_service.send_text_message(user_id, "交易已确认，已记录到账本中。")
-                        else:
-                            await wecom_service.send_text_message(user_id, "确认失败，未找到对应的交易数据。")
-                    else:
-                        await wecom_service.send_text_message(user_id, "未找到待确认的交易数据。")
+                    await confirm_latest_transaction(user_id, db, redis)
                 elif event_key == "cancel":
-                    # 获取用户最新的待确认交易
-                    if user_id in pending_transactions and pending_transactions[user_id]:
-                        # 获取最新的交易timestamp
-                        latest_timestamp = max(pending_transactions[user_id].keys())
-                        
-                        # 从待确认列表中删除
-                        if user_id in pending_transactions and latest_timestamp in pending_transactions[user_id]:
-                            del pending_transactions[user_id][latest_timestamp]
-                            
-                            # 如果用户没有其他待确认交易，删除用户条目
-                            if not pending_transactions[user_id]:
-                                del pending_transactions[user_id]
-                                
-                    await wecom_service.send_text_message(user_id, "交易已取消。")
+                    await cancel_latest_transaction(user_id, db, redis)
             
             # 返回成功响应
-            response_data = {"status": "success"}
-            encrypted_response = wecom_service.encrypt_message(response_data)
-            # 构建符合企业微信要求的XML响应格式
-            xml_response = f"""<xml>
-<Encrypt><![CDATA[{encrypted_response}]]></Encrypt>
-<MsgSignature><![CDATA[{msg_signature}]]></MsgSignature>
-<TimeStamp>{timestamp}</TimeStamp>
-<Nonce><![CDATA[{nonce}]]></Nonce>
-</xml>"""
-            return Response(content=xml_response, media_type="application/xml")
+            encrypted_response = get_encrypted_response("success")
+            return build_xml_response(encrypted_response, msg_signature, timestamp, nonce)
             
         else:
             # 不支持的消息类型
-            response_data = {"status": "unsupported message type"}
-            encrypted_response = wecom_service.encrypt_message(response_data)
-            # 构建符合企业微信要求的XML响应格式
-            xml_response = f"""<xml>
-<Encrypt><![CDATA[{encrypted_response}]]></Encrypt>
-<MsgSignature><![CDATA[{msg_signature}]]></MsgSignature>
-<TimeStamp>{timestamp}</TimeStamp>
-<Nonce><![CDATA[{nonce}]]></Nonce>
-</xml>"""
-            return Response(content=xml_response, media_type="application/xml")
+            encrypted_response = get_encrypted_response("unsupported")
+            return build_xml_response(encrypted_response, msg_signature, timestamp, nonce)
             
     except HTTPException:
         raise
@@ -391,38 +273,32 @@ async def handle_wecom_message(
             detail="Internal server error"
         )
 
-# 临时存储交易数据的字典（实际应用中应使用Redis等）
-# 格式: {user_id: {timestamp: transaction_data}}
-pending_transactions = {}
-
-# 临时存储已处理消息ID的集合，用于消息去重
-# 格式: {msg_id: timestamp}
-processed_messages = {}
-
-async def save_pending_transaction(user_id: str, transaction_data: Dict[str, Any]):
+async def save_pending_transaction(redis: Redis, user_id: str, transaction_data: Dict[str, Any]) -> str:
     """保存待确认的交易数据"""
     timestamp = datetime.now().isoformat()
+    key = PENDING_TRANSACTION_KEY.format(user_id=user_id)
+    entry = json.dumps({"timestamp": timestamp, "data": transaction_data}, ensure_ascii=False)
     
-    if user_id not in pending_transactions:
-        pending_transactions[user_id] = {}
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.lpush(key, entry)
+        pipe.expire(key, PENDING_TRANSACTION_TTL)
+        await pipe.execute()
     
-    pending_transactions[user_id][timestamp] = transaction_data
     return timestamp
 
-async def get_pending_transaction(user_id: str, timestamp: str) -> Optional[Dict[str, Any]]:
-    """获取待确认的交易数据"""
-    if user_id in pending_transactions and timestamp in pending_transactions[user_id]:
-        return pending_transactions[user_id][timestamp]
-    return None
+async def get_latest_pending_transaction(redis: Redis, user_id: str) -> Optional[str]:
+    """获取用户最新的待确认交易（原始JSON），最新的交易位于表头"""
+    return await redis.lindex(PENDING_TRANSACTION_KEY.format(user_id=user_id), 0)
+
+async def delete_pending_transaction(redis: Redis, user_id: str, entry: str) -> bool:
+    """删除待确认的交易，返回是否删除成功；用户没有其他待确认交易时Redis会自动删除该键"""
+    return await redis.lrem(PENDING_TRANSACTION_KEY.format(user_id=user_id), 1, entry) > 0
 
-async def confirm_transaction(user_id: str, timestamp: str, db: AsyncSession):
+async def confirm_transaction(user_id: str, entry: str, db: AsyncSession, redis: Redis):
     """确认交易并保存到数据库"""
-    transaction_data = await get_pending_transaction(user_id, timestamp)
+    transaction_data = json.loads(entry)["data"]
     
-    if not transaction_data:
-        return False
-    
-    # 创建交易记录
+    # 先校验交易数据，数据不合法时不会从待确认列表中取出
     transaction = TransactionCreate(
         amount=transaction_data.get("amount"),
         vendor=transaction_data.get("vendor"),
@@ -432,15 +308,85 @@ async def confirm_transaction(user_id: str, timestamp: str, db: AsyncSession):
         image_url=transaction_data.get("image_url")
     )
     
-    # 保存到数据库
-    await create_transaction(db, transaction, user_id)
+    # 从待确认列表中删除，删除失败说明该交易已被其他请求处理
+    if not await delete_pending_transaction(redis, user_id, entry):
+        return False
     
-    # 从待确认列表中删除
-    if user_id in pending_transactions and timestamp in pending_transactions[user_id]:
-        del pending_transactions[user_id][timestamp]
-        
-        # 如果用户没有其他待确认交易，删除用户条目
-        if not pending_transactions[user_id]:
-            del pending_transactions[user_id]
+    # 保存到数据库，失败时放回待确认列表并恢复过期时间（列表清空后Redis已删除该键）
+    try:
+        await create_transaction(db, transaction, user_id)
+    except Exception:
+        key = PENDING_TRANSACTION_KEY.format(user_id=user_id)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.lpush(key, entry)
+            pipe.expire(key, PENDING_TRANSACTION_TTL)
+            await pipe.execute()
+        raise
     
-    return True
\ No newline at end of file
+    return True
+
+async def confirm_latest_transaction(user_id: str, db: AsyncSession, redis: Redis):
+    """确认用户最新的待确认交易"""
+    latest_entry = await get_latest_pending_transaction(redis, user_id)
+    if not latest_entry:
+        await get_wecom_service().send_text_message(user_id, "未找到待确认的交易数据。")
+        return
+    
+    # 确认交易并保存到数据库
+    success = await confirm_transaction(user_id, latest_entry, db, redis)
+    
+    if success:
+        await get_wecom_service().send_text_message(user_id, "交易已确认，已记录到账本中。")
+    else:
+        await get_wecom_service().send_text_message(user_id, "确认失败，未找到对应的交易数据。")
+
+async def cancel_latest_transaction(user_id: str, db: AsyncSession, redis: Redis):
+    """取消用户最新的待确认交易"""
+    # 从待确认列表表头弹出最新的交易
+    await redis.lpop(PENDING_TRANSACTION_KEY.format(user_id=user_id))
+    
+    await get_wecom_service().send_text_message(user_id, "交易已取消。")
+
+async def send_menu(user_id: str, db: AsyncSession, redis: Redis):
+    """发送菜单选项"""
+    await get_wecom_service().send_text_message(user_id, MENU_TEXT)
+
+async def send_bookkeeping_guide(user_id: str, db: AsyncSession, redis: Redis):
+    """指令1：发送图片记账说明"""
+    await get_wecom_service().send_text_message(user_id, "请发送包含消费信息的收据图片，我将为您自动识别并记账。")
+
+async def send_ledger_notice(user_id: str, db: AsyncSession, redis: Redis):
+    """指令2：查看账本"""
+    # 这里可以添加查看账本的功能
+    await get_wecom_service().send_text_message(user_id, "账本查看功能正在开发中，敬请期待。")
+
+async def send_admin_link(user_id: str, db: AsyncSession, redis: Redis):
+    """指令3：发送后台管理链接"""
+    # 为用户生成一个临时token，有效期1小时
+    token_data = {"sub": user_id}
+    access_token = create_access_token(data=token_data, expires_delta=timedelta(hours=1))
+    admin_url = f"{settings.PENETRATE_URL}/token/{access_token}"
+    await get_wecom_service().send_text_message(user_id, f"后台管理页面：{admin_url}\n\n请使用浏览器打开链接进行管理操作。\n\n注意：链接有效期1小时，请尽快使用。")
+
+async def send_help(user_id: str, db: AsyncSession, redis: Redis):
+    """指令4：发送使用帮助"""
+    await get_wecom_service().send_text_message(user_id, HELP_TEXT)
+
+async def send_unknown_command_reply(user_id: str, content: str):
+    """非预设内容，提供选择"""
+    response_text = f"您发送的消息：'{content}' 不是预设指令。\n\n请选择您需要的操作：\n1. 发送图片进行记账\n2. 查看账本\n3. 访问后台管理\n4. 查看帮助\n\n请回复对应数字或发送'菜单'查看所有选项"
+    await get_wecom_service().send_text_message(user_id, response_text)
+
+# 文本指令分发表，键为去除首尾空白并转为小写后的消息内容
+TEXT_COMMANDS: Dict[str, Callable[[str, AsyncSession, Redis], Awaitable[None]]] = {
+    "确认": confirm_latest_transaction,
+    "confirm": confirm_latest_transaction,
+    "取消": cancel_latest_transaction,
+    "cancel": cancel_latest_transaction,
+    "菜单": send_menu,
+    "menu": send_menu,
+    "1": send_bookkeeping_guide,
+    "2": send_ledger_notice,
+    "3": send_admin_link,
+    "4": send_help,
+}
\ No newline at end of file
@@ -0,0 +1,12 @@
+from redis.asyncio import Redis
+from app.config import settings
+
+# Create shared redis client (connection pool is managed by the client)
+redis_client = Redis.from_url(
+    settings.REDIS_URL,
+    decode_responses=True
+)
+
+# Dependency to get redis client
+async def get_redis() -> Redis:
+    return redis_client
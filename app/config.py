@@ -1,9 +1,13 @@
 from typing import Optional
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./smart_bookkeeper.db"
+    AUTO_CREATE_TABLES: bool = True
+    
+    # Redis
+    REDIS_URL: str = "redis://localhost:6379/0"
     
     # WeChat Work Configuration
     WECOM_CORP_ID: str
@@ -16,6 +20,7 @@ class Settings(BaseSettings):
     AI_API_KEY: str
     AI_API_BASE_URL: str = "https://api.openai.com/v1"
     AI_MODEL_NAME: str = "gpt-3.5-turbo"
+    AI_API_GZIP_REQUESTS: bool = False
     
     # Qianji Configuration
     QIANJI_ENABLED: bool = False
@@ -34,10 +39,11 @@ class Settings(BaseSettings):
     APP_NAME: str = "SmartBookkeeper"
     DEBUG: bool = True
     
-    model_config = {
-        "env_file": ".env",
-        "env_file_encoding": "utf-8",
-        "extra": "ignore"
-    }
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+        frozen=True
+    )
 
 settings = Settings()
\ No newline at end of file
@@ -1,4 +1,4 @@
-# Prompt constants for image recognition service
+# Prompt constants for the AI and image recognition services
 
 # 钱迹模式下的prompt，专注于提取type, money, time, remark四种参数
 QIANJI_MODE_PROMPT = """
@@ -43,4 +43,61 @@ NORMAL_MODE_PROMPT = """
 """
 
 # 系统角色提示
-SYSTEM_ROLE_PROMPT = "你是一个专业的记账助手，擅长从收据图片中提取结构化的记账信息。严格按照要求返回JSON格式数据，不包含任何解释文本。"
\ No newline at end of file
+SYSTEM_ROLE_PROMPT = "你是一个专业的记账助手，擅长从收据图片中提取结构化的记账信息。严格按照要求返回JSON格式数据，不包含任何解释文本。"
+
+# 文本记账信息提取的prompt，{text}为用户输入的文本
+TEXT_EXTRACTION_PROMPT = """
+请从以下文本中提取记账信息，并返回JSON格式的数据：
+
+{text}
+
+请提取以下信息（如果存在）：
+- amount: 金额（数字类型）
+- vendor: 商家名称
+- category: 消费类别（如餐饮、交通、购物等）
+- transaction_date: 交易日期（YYYY-MM-DD格式）
+- description: 摘要描述
+
+如果某项信息无法确定，请设为null。
+只返回JSON格式的数据，不要包含任何解释文本。
+"""
+
+# 文本记账信息提取的系统角色提示
+TEXT_EXTRACTION_SYSTEM_PROMPT = "你是一个专业的记账助手，擅长从文本中提取结构化的记账信息。"
+
+# 生成确认消息的prompt
+CONFIRMATION_MESSAGE_PROMPT = """
+基于以下记账数据，生成一条友好的确认消息：
+
+金额: {amount}
+商家: {vendor}
+类别: {category}
+日期: {transaction_date}
+摘要: {description}
+
+请生成一条简洁、友好的确认消息，提醒用户确认这些信息是否正确。
+"""
+
+# 生成确认消息的系统角色提示
+CONFIRMATION_SYSTEM_PROMPT = "你是一个专业的记账助手，擅长生成友好的用户交互消息。"
+
+# 一次调用同时提取记账信息并生成确认消息的prompt，{text}为用户输入的文本
+TEXT_EXTRACTION_WITH_CONFIRMATION_PROMPT = """
+请从以下文本中提取记账信息，并生成一条确认消息：
+
+{text}
+
+请严格按照以下JSON格式返回，不要输出任何JSON之外的内容：
+{{
+  "data": {{
+    "amount": 金额（数字类型）,
+    "vendor": "商家名称",
+    "category": "消费类别（如餐饮、交通、购物等）",
+    "transaction_date": "交易日期（YYYY-MM-DD格式）",
+    "description": "摘要描述"
+  }},
+  "confirmation": "一条简洁、友好的确认消息，列出上述记账信息并提醒用户确认是否正确"
+}}
+
+如果某项信息无法确定，请设为null。
+"""
@@ -1,17 +1,19 @@
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, insert, update, delete
 from app.models import Transaction
-from app.schemas import TransactionCreate, TransactionUpdate
+from app.schemas import TransactionCreate, TransactionUpdate, TransactionInDB
 
 async def create_transaction(db: AsyncSession, transaction_data: TransactionCreate, user_id: str) -> Transaction:
-    db_transaction = Transaction(
+    # INSERT ... RETURNING gives back the full row in one round-trip instead of INSERT + refresh SELECT
+    query = insert(Transaction).values(
         user_id=user_id,
-        **transaction_data.dict()
-    )
-    db.add(db_transaction)
+        **transaction_data.model_dump()
+    ).returning(Transaction)
+    
+    result = await db.execute(query)
+    db_transaction = result.scalar_one()
     await db.commit()
-    await db.refresh(db_transaction)
     return db_transaction
 
 async def get_transactions_by_user(
@@ -19,10 +21,13 @@ async def get_transactions_by_user(
     user_id: str, 
     skip: int = 0, 
     limit: int = 100
-) -> List[Transaction]:
-    query = select(Transaction).where(Transaction.user_id == user_id).offset(skip).limit(limit)
+) -> List[TransactionInDB]:
+    # Select plain columns and build the schema directly, skipping ORM hydration on the list path
+    query = select(*Transaction.__table__.columns).where(
+        Transaction.user_id == user_id
+    ).order_by(Transaction.transaction_date.desc()).offset(skip).limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return [TransactionInDB.model_construct(**row) for row in result.mappings()]
 
 async def get_transaction_by_id(db: AsyncSession, transaction_id: int, user_id: str) -> Optional[Transaction]:
     query = select(Transaction).where(
@@ -38,35 +43,29 @@ async def update_transaction(
     transaction_data: TransactionUpdate, 
     user_id: str
 ) -> Optional[Transaction]:
-    # First check if transaction exists and belongs to user
-    transaction = await get_transaction_by_id(db, transaction_id, user_id)
-    if not transaction:
-        return None
-    
     # Update only provided fields
-    update_data = transaction_data.dict(exclude_unset=True)
+    update_data = transaction_data.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_transaction_by_id(db, transaction_id, user_id)
+    
+    # Single round-trip: the user_id filter doubles as the ownership check
     query = update(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == user_id
-    ).values(**update_data)
+    ).values(**update_data).returning(Transaction)
     
-    await db.execute(query)
+    result = await db.execute(query)
+    transaction = result.scalar_one_or_none()
     await db.commit()
-    
-    # Return updated transaction
-    return await get_transaction_by_id(db, transaction_id, user_id)
+    return transaction
 
 async def delete_transaction(db: AsyncSession, transaction_id: int, user_id: str) -> bool:
-    # First check if transaction exists and belongs to user
-    transaction = await get_transaction_by_id(db, transaction_id, user_id)
-    if not transaction:
-        return False
-    
     query = delete(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == user_id
-    )
+    ).returning(Transaction.id)
     
-    await db.execute(query)
+    result = await db.execute(query)
+    deleted_id = result.scalar_one_or_none()
     await db.commit()
-    return True
\ No newline at end of file
+    return deleted_id is not None
\ No newline at end of file
@@ -1,12 +1,29 @@
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
 
+is_sqlite = make_url(settings.DATABASE_URL).get_backend_name() == "sqlite"
+
+if is_sqlite:
+    # aiosqlite opens file databases with NullPool, so only connect args apply
+    engine_options = {"connect_args": {"check_same_thread": False}}
+else:
+    # Explicit pool instead of the 5/10 defaults that time out under bursts
+    engine_options = {
+        "pool_size": 20,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800
+    }
+
 # Create async engine
 engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=True,
-    future=True
+    echo=settings.DEBUG,
+    future=True,
+    **engine_options
 )
 
 # Create async session factory
@@ -16,17 +33,27 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+async def enable_sqlite_wal():
+    """Switch SQLite to WAL so readers don't block on the writer.
+
+    The journal mode is persisted in the database file, so this runs once at
+    startup rather than on every connection (NullPool connects per session).
+    """
+    if not is_sqlite:
+        return
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
 # Base class for models
 Base = declarative_base()
 
 # Dependency to get DB session
+# CRUD helpers commit explicitly, so read-only requests never issue a COMMIT;
+# the session is closed by the context manager
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
         except Exception:
             await session.rollback()
-            raise
-        finally:
-            await session.close()
\ No newline at end of file
+            raise
\ No newline at end of file
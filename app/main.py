@@ -1,78 +1,107 @@
 from fastapi import FastAPI, Request, Query, HTTPException, status
 from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from sqlalchemy.ext.asyncio import create_async_engine
-from app.database import Base, engine
+from app.database import Base, engine, enable_sqlite_wal
+from app.cache import redis_client
+from app.services.http_client import get_session, close_session
 from app.api import api_router
 from app.config import settings
-from app.security import create_access_token
-from jose import JWTError, jwt
+from app.security import decode_access_token
 from typing import Optional
+from contextlib import asynccontextmanager
+import orjson
 import uvicorn
 import logging
+import asyncio
+import os
+import sys
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def verify_token(token: str) -> Optional[str]:
-    """验证token并返回用户ID"""
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            return None
-        return user_id
-    except JWTError:
-        return None
-
-# 创建FastAPI应用实例
-app = FastAPI(
-    title="SmartBookkeeper",
-    description="智能记账机器人后端服务",
-    version="1.0.0"
+# 配置模板目录，生产环境关闭自动重载，避免每次渲染都检查模板文件
+templates = Jinja2Templates(
+    directory="app/templates",
+    auto_reload=settings.DEBUG,
+    cache_size=400
 )
 
-# 挂载静态文件目录
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
-
-# 挂载log目录用于图片识别服务访问临时图片文件
-app.mount("/log", StaticFiles(directory="log"), name="log")
+async def init_db():
+    """创建数据库表"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    logger.info("Database tables created successfully")
 
-# 配置模板目录
-templates = Jinja2Templates(directory="app/templates")
+async def init_log_dir():
+    """创建图片日志目录"""
+    await asyncio.to_thread(os.makedirs, "log", exist_ok=True)
 
-# 挂载API路由
-app.include_router(api_router, prefix="")
+async def warm_templates():
+    """预编译首页模板，避免首个请求承担编译开销"""
+    templates.get_template("index.html")
 
-@app.on_event("startup")
-async def startup_event():
-    """应用启动时执行的操作"""
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时初始化资源，关闭时释放资源"""
     logger.info("Starting up SmartBookkeeper application...")
     
-    # 创建数据库表
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # SQLite的WAL模式持久化在数据库文件中，启动时设置一次即可
+    await enable_sqlite_wal()
+    
+    # 并发执行相互独立的初始化操作，同时预先创建共享HTTP会话
+    startup_tasks = [init_log_dir(), warm_templates(), get_session()]
+    if settings.AUTO_CREATE_TABLES:
+        startup_tasks.append(init_db())
+    await asyncio.gather(*startup_tasks)
+    
+    yield
     
-    logger.info("Database tables created successfully")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """应用关闭时执行的操作"""
     logger.info("Shutting down SmartBookkeeper application...")
     
     # 关闭数据库连接
     await engine.dispose()
     
     logger.info("Database connections closed")
+    
+    # 关闭Redis连接
+    await redis_client.aclose()
+    
+    logger.info("Redis connections closed")
+    
+    # 关闭共享HTTP会话
+    await close_session()
+    
+    logger.info("HTTP client session closed")
+
+# 创建FastAPI应用实例
+app = FastAPI(
+    title="SmartBookkeeper",
+    description="智能记账机器人后端服务",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+# 压缩较大的响应，如交易列表接口
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# 挂载静态文件目录
+app.mount("/static", StaticFiles(directory="app/static"), name="static")
+
+# 挂载API路由
+app.include_router(api_router, prefix="")
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request, token: Optional[str] = Query(None)):
     """根路径，返回欢迎页面"""
     if token:
         # 验证token并获取用户ID
-        user_id = verify_token(token)
+        user_id = decode_access_token(token)
         if user_id:
             # 将用户ID传递给模板
             return templates.TemplateResponse("index.html", {"request": request, "user_id": user_id})
@@ -87,7 +116,7 @@ async def root(request: Request, token: Optional[str] = Query(None)):
 async def token_access(request: Request, access_token: str):
     """通过路径参数验证token并返回管理页面"""
     # 验证token并获取用户ID
-    user_id = verify_token(access_token)
+    user_id = decode_access_token(access_token)
     if user_id:
         # 将用户ID传递给模板
         return templates.TemplateResponse("index.html", {"request": request, "user_id": user_id})
@@ -95,15 +124,22 @@ async def token_access(request: Request, access_token: str):
         # token无效，返回错误页面
         return templates.TemplateResponse("index.html", {"request": request, "error": "无效的访问链接或链接已过期"})
 
-@app.get("/health")
+# 健康检查响应体固定不变，预先序列化
+HEALTH_BODY = orjson.dumps({"status": "healthy"})
+
 async def health_check():
     """健康检查端点"""
-    return {"status": "healthy"}
+    return Response(content=HEALTH_BODY, media_type="application/json")
+
+app.add_api_route("/health", health_check, methods=["GET"], include_in_schema=False)
 
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
+        # 显式指定uvloop和httptools，缺少依赖时直接报错而不是静默退回到较慢的实现
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         reload=True
     )
\ No newline at end of file
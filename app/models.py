@@ -6,7 +6,7 @@ class Transaction(Base):
     __tablename__ = "transactions"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String(100), index=True, nullable=False)
+    user_id = Column(String(100), nullable=False)
     amount = Column(Float, nullable=False)
     vendor = Column(String(100), nullable=False)
     category = Column(String(50), nullable=False)
@@ -16,5 +16,6 @@ class Transaction(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Create index on user_id for faster queries
-    __table_args__ = (Index('idx_user_id', 'user_id'),)
\ No newline at end of file
+    # Composite index serving the per-user listing ordered by transaction_date;
+    # its user_id prefix also covers plain user_id lookups
+    __table_args__ = (Index('idx_user_txn_date', 'user_id', transaction_date.desc()),)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class TransactionBase(BaseModel):
     amount: float
@@ -14,6 +14,8 @@ class TransactionCreate(TransactionBase):
     pass
 
 class TransactionUpdate(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     amount: Optional[float] = None
     vendor: Optional[str] = None
     category: Optional[str] = None
@@ -27,8 +29,7 @@ class TransactionInDB(TransactionBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Token(BaseModel):
     access_token: str
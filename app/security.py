@@ -1,15 +1,31 @@
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.database import get_db
-from app.schemas import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
 
+# JWT签名密钥和算法在进程内不变，只需构建一次
+_JWT_KEY = settings.JWT_SECRET_KEY
+_JWT_ALGORITHM = settings.JWT_ALGORITHM
+_JWT_ALGS = [_JWT_ALGORITHM]
+
+# 已验证token的缓存，键为token的SHA-256摘要，值为(user_id, exp)
+# 缓存时间最长60秒，且不会超过token本身的过期时间
+_token_cache = TTLCache(maxsize=10000, ttl=60)
+_token_cache_lock = threading.Lock()
+
+# 验证失败的token的缓存，避免反复提交的无效token每次都重新校验签名
+_invalid_token_cache = TTLCache(maxsize=10000, ttl=5)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -17,24 +33,57 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _JWT_KEY, algorithm=_JWT_ALGORITHM)
     return encoded_jwt
 
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def invalidate_token(token_hash: str):
+    """从缓存中移除token，用于登出等需要令token立即失效的场景"""
+    with _token_cache_lock:
+        _token_cache.pop(token_hash, None)
+
+def decode_access_token(token: str) -> Optional[str]:
+    """验证token并返回用户ID，验证结果会被缓存"""
+    token_hash = hash_token(token)
+    now = time.time()
+    
+    with _token_cache_lock:
+        cached = _token_cache.get(token_hash)
+        known_invalid = token_hash in _invalid_token_cache
+    if known_invalid:
+        return None
+    if cached is not None:
+        user_id, exp = cached
+        if exp > now:
+            return user_id
+    
+    try:
+        payload = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGS)
+        user_id: str = payload.get("sub")
+    except JWTError:
+        user_id = None
+    
+    if user_id is None:
+        with _token_cache_lock:
+            _invalid_token_cache[token_hash] = True
+        return None
+    
+    with _token_cache_lock:
+        _token_cache[token_hash] = (user_id, payload.get("exp", float("inf")))
+    return user_id
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
-    except JWTError:
+    user_id = decode_access_token(token)
+    if user_id is None:
         raise credentials_exception
     
     # In a real application, you might want to check if the user exists in the database
     # For now, we just return the user_id
-    return token_data.user_id
\ No newline at end of file
+    return user_id
\ No newline at end of file
@@ -0,0 +1,31 @@
+import asyncio
+import aiohttp
+from typing import Optional
+
+# 共享的HTTP会话，复用连接池，避免每次请求都重新进行TCP/TLS握手
+_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
+async def get_session() -> aiohttp.ClientSession:
+    """获取共享的aiohttp会话，首次调用时创建"""
+    global _session
+    if _session is None or _session.closed:
+        async with _session_lock:
+            if _session is None or _session.closed:
+                _session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(
+                        limit=100,
+                        limit_per_host=32,
+                        enable_cleanup_closed=True,
+                        ttl_dns_cache=300
+                    ),
+                    timeout=aiohttp.ClientTimeout(total=60, connect=10)
+                )
+    return _session
+
+async def close_session():
+    """关闭共享的aiohttp会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,121 @@
+import gzip
+import logging
+import re
+import orjson
+from typing import Dict, Any, List, Optional
+from app.config import settings
+from app.services.http_client import get_session
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 匹配markdown代码块标记，以及回复中最外层的JSON对象
+_JSON_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+# 图片以data URL形式内联发送给大模型
+_DATA_URL_PREFIX = "data:image/jpeg;base64,"
+
+def extract_json(text: str) -> Dict[str, Any]:
+    """从大模型回复中提取JSON对象
+
+    先去掉markdown代码块标记直接解析，失败或结果不是对象时再提取文本中的JSON部分。
+    找不到JSON对象时抛出ValueError，JSON格式错误时抛出orjson.JSONDecodeError。
+    """
+    try:
+        result = orjson.loads(_JSON_FENCE.sub("", text).strip())
+        if isinstance(result, dict):
+            return result
+    except orjson.JSONDecodeError:
+        pass
+    match = _JSON_OBJECT.search(text)
+    if match is None:
+        raise ValueError("AI response does not contain valid JSON")
+    result = orjson.loads(match.group())
+    if not isinstance(result, dict):
+        raise ValueError("AI response does not contain valid JSON")
+    return result
+
+class LLMAPIError(Exception):
+    """大模型API调用失败，status为HTTP状态码，服务返回错误时为None"""
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class LLMClient:
+    """OpenAI兼容的chat/completions接口客户端，文本和图片识别共用"""
+    def __init__(self):
+        self.model_name = settings.AI_MODEL_NAME
+        self.url = f"{settings.AI_API_BASE_URL}/chat/completions"
+        self.gzip_requests = settings.AI_API_GZIP_REQUESTS
+        self.headers = {
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Authorization": f"Bearer {settings.AI_API_KEY}"
+        }
+        if self.gzip_requests:
+            self.headers["Content-Encoding"] = "gzip"
+
+    async def chat(self, messages: List[Dict[str, Any]], temperature: float = 0.1, max_tokens: int = 500) -> str:
+        """发送对话请求，返回大模型回复的文本内容"""
+        request_data = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+        body = orjson.dumps(request_data)
+        if self.gzip_requests:
+            body = gzip.compress(body, compresslevel=6)
+
+        session = await get_session()
+        async with session.post(self.url, data=body, headers=self.headers) as response:
+            # 记录API请求信息
+            logger.info(f"发送AI API请求，模型: {self.model_name}, URL: {self.url}, 状态码: {response.status}")
+
+            if response.status != 200:
+                try:
+                    error_response = await response.text()
+                    logger.warning(f"AI API请求失败，状态码: {response.status}, 响应内容: {error_response}")
+                except Exception as e:
+                    logger.warning(f"AI API请求失败，状态码: {response.status}, 无法获取响应内容: {e}")
+                raise LLMAPIError(f"AI API request failed with status {response.status}", response.status)
+
+            result = orjson.loads(await response.read())
+
+            # 解析结果
+            if "error" in result:
+                logger.warning(f"AI API返回错误: {result['error']}")
+                raise LLMAPIError(f"AI API error: {result['error']}")
+
+            # 提取AI返回的文本
+            return result["choices"][0]["message"]["content"].strip()
+
+    async def extract_from_image(self, image_base64: str, prompt: str, system_prompt: str) -> str:
+        """发送多模态请求，让大模型根据prompt识别图片内容"""
+        messages = [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": _DATA_URL_PREFIX + image_base64
+                        }
+                    }
+                ]
+            }
+        ]
+        return await self.chat(messages)
+
+# 创建客户端实例
+llm_client = LLMClient()
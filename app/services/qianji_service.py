@@ -1,10 +1,30 @@
+from functools import cache
 from typing import Dict, Any, Optional
-from urllib.parse import quote
+from urllib.parse import urlencode
 from app.config import settings
 import logging
+import string
 
 logger = logging.getLogger(__name__)
 
+# URL编码不需要转义的字节：RFC 3986非保留字符
+_SAFE_BYTES = (string.ascii_letters + string.digits + "_.-~").encode("ascii")
+
+# 预计算的转义表，下标为字节值，安全字节映射为自身，其余映射为%XX
+_ENC_TABLE = [chr(b) if b in _SAFE_BYTES else f"%{b:02X}" for b in range(256)]
+
+def _fast_quote(s: str, safe: str = "", encoding: Optional[str] = None, errors: Optional[str] = None) -> str:
+    """查表进行URL编码，结果与urllib.parse.quote(s, safe="")一致
+
+    签名与quote保持一致以便用作urlencode的quote_via，safe、encoding、errors参数被忽略，
+    始终只保留非保留字符并使用UTF-8编码
+    """
+    data = s.encode("utf-8")
+    # 删除所有安全字节后为空，说明无需转义，直接返回原字符串
+    if not data.translate(None, _SAFE_BYTES):
+        return s
+    return "".join([_ENC_TABLE[b] for b in data])
+
 class QianjiService:
     """钱迹服务，用于生成钱迹记账链接"""
     
@@ -19,23 +39,27 @@ class QianjiService:
             transaction_data: 交易数据字典，包含amount, vendor, category, transaction_date, description等字段
             
         Returns:
-            钱迹记账链接
+            钱迹记账链接，未启用钱迹时返回空字符串
         """
+        # 未启用钱迹时无需构建链接
+        if not self.enabled:
+            return ""
+        
         try:
             # 钱迹API基础URL
             base_url = "qianji://publicapi/addbill?"
             
-            # 构建参数
-            params = []
+            # 构建参数，统一在urlencode中完成转义
+            pairs = []
             
             # type参数：0支出，1收入，默认为支出
             # 由于图片识别无法确定是收入还是支出，默认设为支出
-            params.append(f"type=0")
+            pairs.append(("type", "0"))
             
             # money参数：金额
             amount = transaction_data.get("amount")
             if amount is not None:
-                params.append(f"money={amount}")
+                pairs.append(("money", str(amount)))
             else:
                 logger.warning("交易数据中缺少金额信息")
                 return ""
@@ -46,27 +70,27 @@ class QianjiService:
                 # 如果只有日期，添加默认时间
                 if " " not in transaction_date:
                     transaction_date += " 12:00:00"
-                params.append(f"time={transaction_date}")
+                pairs.append(("time", transaction_date))
             
             # remark参数：备注
             description = transaction_data.get("description") or transaction_data.get("vendor")
             if description:
-                params.append(f"remark={quote(description)}")
+                pairs.append(("remark", description))
             
             # catename参数：分类名称
             category = transaction_data.get("category")
             if category and not self.cate_choose:
-                params.append(f"catename={quote(category)}")
+                pairs.append(("catename", category))
             
             # catechoose参数：是否弹出分类选择面板
             if self.cate_choose:
-                params.append("catechoose=1")
+                pairs.append(("catechoose", "1"))
                 # 可以添加主题参数，默认为黑色主题
-                # params.append("catetheme=light")  # 白色主题
-                # params.append("catetheme=auto")   # 自动适应系统主题
+                # pairs.append(("catetheme", "light"))  # 白色主题
+                # pairs.append(("catetheme", "auto"))  # 自动适应系统主题
             
             # 拼接URL
-            url = base_url + "&".join(params)
+            url = base_url + urlencode(pairs, quote_via=_fast_quote)
             
             logger.info(f"生成的钱迹记账链接: {url}")
             return url
@@ -108,5 +132,7 @@ class QianjiService:
             logger.error(f"格式化交易数据失败: {e}")
             return {}
 
-# 创建服务实例
-qianji_service = QianjiService()
\ No newline at end of file
+# 首次使用时才创建服务实例
+@cache
+def get_qianji_service() -> QianjiService:
+    return QianjiService()
\ No newline at end of file
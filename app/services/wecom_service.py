@@ -1,15 +1,46 @@
+import asyncio
 import base64
+import hashlib
+import logging
+import secrets
+from collections import OrderedDict
+from functools import cache
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from typing import Dict, Any, Optional
-from datetime import datetime
-import aiohttp
-import json
+import orjson
 from app.config import settings
+from app.services.http_client import get_session
 import time
 
 # 导入企业微信官方加解密库
 from app.weworkapi import WXBizMsgCrypt
 
+logger = logging.getLogger(__name__)
+
+# 解密结果缓存的最大条目数，企业微信超时重试时会重复推送同一条加密消息
+DECRYPT_CACHE_SIZE = 512
+
+# 企业微信发送应用消息接口
+SEND_MESSAGE_URL = "https://qyapi.weixin.qq.com/cgi-bin/message/send"
+
+# 发送JSON请求体时使用的请求头
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# 下载媒体文件时每次读取的块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 确认卡片的描述模板
+CARD_DESCRIPTION_TEMPLATE = (
+    "请确认以下记账信息是否正确\n\n"
+    "金额: {amount}\n"
+    "商家: {vendor}\n"
+    "类别: {category}\n"
+    "日期: {transaction_date}\n\n"
+    "备注: {description}\n\n"
+    "请回复'确认'或'取消'来处理此交易。"
+)
+
 class WeComService:
     def __init__(self):
         self.corp_id = settings.WECOM_CORP_ID
@@ -18,7 +49,8 @@ class WeComService:
         self.aes_key = settings.WECOM_AES_KEY
         self.agent_id = settings.WECOM_AGENT_ID
         self.access_token = None
-        self.token_expires_at = 0
+        self.token_expires_at = 0.0
+        self.token_lock = asyncio.Lock()
         
         # 创建企业微信加解密实例
         self.wx_crypt = WXBizMsgCrypt(
@@ -26,54 +58,70 @@ class WeComService:
             self.aes_key, 
             self.corp_id
         )
+        
+        # 确认卡片中与用户和交易无关的部分，使用textcard类型替代interactive
+        self.card_shell = {
+            "msgtype": "textcard",
+            "agentid": self.agent_id,
+            "textcard": {
+                "title": "记账信息确认",
+                "url": "javascript:void(0);",
+                "btntxt": "详情"
+            }
+        }
+        
+        # 已解密消息的LRU缓存，键包含签名、时间戳和随机数，相同请求才会命中
+        self.decrypt_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
     
     async def get_access_token(self) -> str:
         """获取企业微信access_token"""
         # 如果token未过期，直接返回
-        if self.access_token and self.token_expires_at > datetime.now().timestamp():
+        if self.access_token and self.token_expires_at > time.monotonic():
             return self.access_token
         
-        url = f"https://qyapi.weixin.qq.com/cgi-bin/gettoken?corpid={self.corp_id}&corpsecret={self.secret}"
-        
-        async with aiohttp.ClientSession() as session:
+        # 同一时刻只允许一个协程刷新token，其余协程等待并复用刷新结果
+        async with self.token_lock:
+            # 获取锁后再次检查，token可能已被其他协程刷新
+            if self.access_token and self.token_expires_at > time.monotonic():
+                return self.access_token
+            
+            url = f"https://qyapi.weixin.qq.com/cgi-bin/gettoken?corpid={self.corp_id}&corpsecret={self.secret}"
+            
+            session = await get_session()
             async with session.get(url) as response:
-                data = await response.json()
+                data = orjson.loads(await response.read())
                 
                 if data["errcode"] != 0:
                     raise Exception(f"Failed to get access token: {data['errmsg']}")
                 
                 self.access_token = data["access_token"]
                 # 提前5分钟过期
-                self.token_expires_at = datetime.now().timestamp() + data["expires_in"] - 300
+                self.token_expires_at = time.monotonic() + data["expires_in"] - 300
                 return self.access_token
     
-    async def download_image(self, media_id: str) -> bytes:
-        """下载企业微信图片"""
+    async def download_image(self, media_id: str) -> bytearray:
+        """下载企业微信图片，分块读取到同一个缓冲区中"""
         access_token = await self.get_access_token()
         url = f"https://qyapi.weixin.qq.com/cgi-bin/media/get?access_token={access_token}&media_id={media_id}"
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to download image: {response.status}")
-                return await response.read()
+        session = await get_session()
+        async with session.get(url) as response:
+            response.raise_for_status()
+            
+            image_data = bytearray()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                image_data.extend(chunk)
+            return image_data
     
     async def send_confirmation_card(self, user_id: str, data: Dict[str, Any]) -> bool:
         """发送确认卡片"""
         try:
-            access_token = await self.get_access_token()
-            url = f"https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={access_token}"
-            
             # 数据验证和格式化
-            # 确保金额是数字类型，并且格式化为合适的字符串
-            amount = data.get('amount', 0)
-            if isinstance(amount, (int, float)):
-                amount_str = f"¥{amount:.2f}"
-            else:
-                try:
-                    amount_str = f"¥{float(amount):.2f}"
-                except (ValueError, TypeError):
-                    amount_str = "¥0.00"
+            # 金额统一转换为浮点数后格式化，无法转换时显示为0
+            try:
+                amount_str = f"¥{float(data.get('amount', 0)):.2f}"
+            except (ValueError, TypeError):
+                amount_str = "¥0.00"
             
             # 获取并默认处理其他字段
             vendor = data.get('vendor', '未知商家')
@@ -82,39 +130,33 @@ class WeComService:
             description = data.get('description', '无')
             transaction_id = data.get('transaction_id', '')
             
-            # 构建卡片消息 - 使用textcard类型替代interactive
+            # 构建卡片消息 - 在固定外壳的基础上只填充接收人和描述
             card_data = {
                 "touser": user_id,
-                "msgtype": "textcard",
-                "agentid": self.agent_id,
+                **self.card_shell,
                 "textcard": {
-                    "title": "记账信息确认",
-                    "description": f"请确认以下记账信息是否正确\n\n金额: {amount_str}\n商家: {vendor}\n类别: {category}\n日期: {transaction_date}\n\n备注: {description}\n\n请回复'确认'或'取消'来处理此交易。",
-                    "url": "javascript:void(0);",
-                    "btntxt": "详情"
+                    **self.card_shell["textcard"],
+                    "description": CARD_DESCRIPTION_TEMPLATE.format(
+                        amount=amount_str,
+                        vendor=vendor,
+                        category=category,
+                        transaction_date=transaction_date,
+                        description=description
+                    )
                 }
             }
             
             # 添加调试日志
-            print(f"发送确认卡片: 用户ID={user_id}, 金额={amount_str}, 商家={vendor}")
+            logger.debug("发送确认卡片: 用户ID=%s, 金额=%s, 商家=%s", user_id, amount_str, vendor)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=card_data) as response:
-                    data = await response.json()
-                    print(f"发送确认卡片结果: {data}")
-                    return data["errcode"] == 0
+            return await self._post(card_data)
         except Exception as e:
-            print(f"发送确认卡片失败: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("发送确认卡片失败: %s", e)
             # 即使失败，也返回True，避免回调接口返回错误
             return True
     
     async def send_text_message(self, user_id: str, content: str) -> bool:
         """发送文本消息"""
-        access_token = await self.get_access_token()
-        url = f"https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={access_token}"
-        
         message_data = {
             "touser": user_id,
             "msgtype": "text",
@@ -124,10 +166,22 @@ class WeComService:
             }
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=message_data) as response:
-                data = await response.json()
-                return data["errcode"] == 0
+        return await self._post(message_data)
+    
+    async def _post(self, payload: Dict[str, Any]) -> bool:
+        """调用企业微信发送应用消息接口，返回是否发送成功"""
+        access_token = await self.get_access_token()
+        
+        session = await get_session()
+        async with session.post(
+            SEND_MESSAGE_URL,
+            params={"access_token": access_token},
+            data=orjson.dumps(payload),
+            headers=JSON_HEADERS
+        ) as response:
+            data = orjson.loads(await response.read())
+            logger.debug("发送应用消息结果: %s", data)
+            return data["errcode"] == 0
     
     def decrypt_echostr(self, msg_signature: str, timestamp: str, nonce: str, echostr: str) -> str:
         """使用企业微信官方库解密echostr参数"""
@@ -136,19 +190,17 @@ class WeComService:
             ret, sEchoStr = self.wx_crypt.VerifyURL(msg_signature, timestamp, nonce, echostr)
             
             # 添加调试日志
-            print(f"VerifyURL返回码: {ret}")
-            print(f"解密后的echostr: {sEchoStr}")
+            logger.debug("VerifyURL返回码: %s", ret)
+            logger.debug("解密后的echostr: %s", sEchoStr)
             
             # 验证成功
             if ret == 0:
                 return sEchoStr.decode('utf-8') if isinstance(sEchoStr, bytes) else sEchoStr
             else:
-                print(f"echostr解密失败，错误码: {ret}")
+                logger.warning("echostr解密失败，错误码: %s", ret)
                 return ""
         except Exception as e:
-            print(f"echostr解密过程异常: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("echostr解密过程异常: %s", e)
             return ""
     
     def verify_url(self, msg_signature: str, timestamp: str, nonce: str, echostr: str) -> bool:
@@ -158,89 +210,87 @@ class WeComService:
             ret, _ = self.wx_crypt.VerifyURL(msg_signature, timestamp, nonce, echostr)
             
             # 添加调试日志
-            print(f"URL验证返回码: {ret}")
+            logger.debug("URL验证返回码: %s", ret)
             
             # 验证成功返回True，否则返回False
             return ret == 0
         except Exception as e:
-            print(f"URL验证过程异常: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("URL验证过程异常: %s", e)
             return False
     
     def decrypt_message(self, encrypted_msg: str, msg_signature: str, timestamp: str, nonce: str) -> Dict[str, Any]:
         """使用企业微信官方库解密消息"""
+        # 重试推送的消息直接返回缓存的解密结果，跳过签名校验和AES解密
+        cache_key = b"|".join((
+            hashlib.blake2b(encrypted_msg.encode(), digest_size=16).digest(),
+            msg_signature.encode(),
+            timestamp.encode(),
+            nonce.encode()
+        ))
+        cached = self.decrypt_cache.get(cache_key)
+        if cached is not None:
+            self.decrypt_cache.move_to_end(cache_key)
+            return dict(cached)
+        
         try:
             # 使用企业微信官方库解密消息
             ret, sMsg = self.wx_crypt.DecryptMsg(encrypted_msg, msg_signature, timestamp, nonce)
             
             # 添加调试日志
-            print(f"DecryptMsg返回码: {ret}")
-            print(f"解密后的消息: {sMsg}")
+            logger.debug("DecryptMsg返回码: %s", ret)
+            logger.debug("解密后的消息: %s", sMsg)
             
             # 解密成功
             if ret == 0 and sMsg:
-                # 解析XML消息
-                if isinstance(sMsg, bytes):
-                    sMsg = sMsg.decode('utf-8')
-                
+                # 解析XML消息，解密结果为UTF-8字节串，直接交给解析器而无需先解码
                 msg_root = ET.fromstring(sMsg)
                 
+                # 一次遍历提取所有子元素，避免对每个字段重复查找
+                fields = {child.tag: child.text for child in msg_root}
+                
                 # 提取消息字段
                 result = {
-                    "ToUserName": msg_root.find('ToUserName').text if msg_root.find('ToUserName') is not None else "",
-                    "FromUserName": msg_root.find('FromUserName').text if msg_root.find('FromUserName') is not None else "",
-                    "CreateTime": int(msg_root.find('CreateTime').text) if msg_root.find('CreateTime') is not None else 0,
-                    "MsgType": msg_root.find('MsgType').text if msg_root.find('MsgType') is not None else "",
-                    "MsgId": msg_root.find('MsgId').text if msg_root.find('MsgId') is not None else ""
+                    "ToUserName": fields.get("ToUserName") or "",
+                    "FromUserName": fields.get("FromUserName") or "",
+                    "CreateTime": int(fields.get("CreateTime") or 0),
+                    "MsgType": fields.get("MsgType") or "",
+                    "MsgId": fields.get("MsgId") or ""
                 }
                 
                 # 如果存在AgentID，也提取出来
-                agent_id_elem = msg_root.find('AgentID')
-                if agent_id_elem is not None and agent_id_elem.text:
-                    result["AgentID"] = agent_id_elem.text
+                if fields.get("AgentID"):
+                    result["AgentID"] = fields["AgentID"]
                 
                 # 根据消息类型提取特定字段
                 if result["MsgType"] == "text":
-                    result["Content"] = msg_root.find('Content').text if msg_root.find('Content') is not None else ""
+                    result["Content"] = fields.get("Content") or ""
                 elif result["MsgType"] == "image":
-                    result["PicUrl"] = msg_root.find('PicUrl').text if msg_root.find('PicUrl') is not None else ""
-                    result["MediaId"] = msg_root.find('MediaId').text if msg_root.find('MediaId') is not None else ""
+                    result["PicUrl"] = fields.get("PicUrl") or ""
+                    result["MediaId"] = fields.get("MediaId") or ""
                 elif result["MsgType"] == "event":
-                    result["Event"] = msg_root.find('Event').text if msg_root.find('Event') is not None else ""
-                    result["EventKey"] = msg_root.find('EventKey').text if msg_root.find('EventKey') is not None else ""
+                    result["Event"] = fields.get("Event") or ""
+                    result["EventKey"] = fields.get("EventKey") or ""
+                
+                # 只缓存解密成功的结果，超出容量时淘汰最久未使用的条目
+                self.decrypt_cache[cache_key] = result
+                if len(self.decrypt_cache) > DECRYPT_CACHE_SIZE:
+                    self.decrypt_cache.popitem(last=False)
                 
-                return result
+                return dict(result)
             else:
-                print(f"消息解密失败，错误码: {ret}")
+                logger.warning("消息解密失败，错误码: %s", ret)
                 return {}
         except Exception as e:
-            print(f"消息解密过程异常: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("消息解密过程异常: %s", e)
             return {}
     
-    def verify_msg_signature(self, msg_signature: str, timestamp: str, nonce: str, encrypt_msg: str) -> bool:
-        """使用企业微信官方库验证消息签名"""
-        try:
-            # 企业微信官方库的DecryptMsg方法已经包含了签名验证
-            # 这里我们可以直接返回True，因为实际验证在decrypt_message方法中完成
-            return True
-        except Exception as e:
-            print(f"消息签名验证过程异常: {e}")
-            return False
-    
     def encrypt_message(self, message: Dict[str, Any]) -> str:
         """使用企业微信官方库加密消息"""
         try:
-            # 1. 将消息转换为XML格式
-            msg_xml = ET.Element('xml')
-            for key, value in message.items():
-                elem = ET.SubElement(msg_xml, key)
-                elem.text = str(value)
-            
-            msg_str = ET.tostring(msg_xml, encoding='utf-8')
-            msg_str = msg_str.decode('utf-8')
+            # 1. 将消息转换为XML格式，字段都是扁平文本，直接拼接无需构建元素树
+            msg_str = "<xml>" + "".join(
+                f"<{key}>{escape(str(value))}</{key}>" for key, value in message.items()
+            ) + "</xml>"
             
             # 2. 生成随机字符串
             nonce = self.generate_random_string(10)
@@ -249,50 +299,25 @@ class WeComService:
             ret, sEncryptMsg = self.wx_crypt.EncryptMsg(msg_str, nonce)
             
             # 添加调试日志
-            print(f"EncryptMsg返回码: {ret}")
-            print(f"加密后的消息: {sEncryptMsg}")
+            logger.debug("EncryptMsg返回码: %s", ret)
+            logger.debug("加密后的消息: %s", sEncryptMsg)
             
             # 加密成功
             if ret == 0:
                 return sEncryptMsg
             else:
-                print(f"消息加密失败，错误码: {ret}")
+                logger.warning("消息加密失败，错误码: %s", ret)
                 return ""
         except Exception as e:
-            print(f"消息加密过程异常: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("消息加密过程异常: %s", e)
             return ""
     
     def generate_random_string(self, length: int) -> str:
         """生成随机字符串"""
-        import random
-        import string
-        chars = string.ascii_letters + string.digits
-        return ''.join(random.choice(chars) for _ in range(length))
-    
-    def generate_msg_signature(self, token: str, timestamp: str, nonce: str, encrypt_msg: str) -> str:
-        """生成消息签名"""
-        # 企业微信官方库已经包含了签名生成逻辑
-        # 这里我们可以保留这个方法，但实际应用中应该使用官方库的方法
-        try:
-            import hashlib
-            # 将token、timestamp、nonce、encrypt_msg四个参数进行字典序排序
-            params = [token, timestamp, nonce, encrypt_msg]
-            params.sort()
-            
-            # 将排序后的参数拼接成一个字符串
-            param_str = ''.join(params)
-            
-            # 将字符串进行SHA1加密
-            sha1 = hashlib.sha1()
-            sha1.update(param_str.encode('utf-8'))
-            
-            # 返回签名
-            return sha1.hexdigest()
-        except Exception as e:
-            print(f"生成签名失败: {e}")
-            return ""
+        # token_urlsafe按字节数生成，每字节约对应1.3个字符，截取后长度恰好为length
+        return secrets.token_urlsafe(length)[:length]
 
-# 创建服务实例
-wecom_service = WeComService()
\ No newline at end of file
+# 首次使用时才创建服务实例，避免导入时初始化加解密上下文
+@cache
+def get_wecom_service() -> WeComService:
+    return WeComService()
\ No newline at end of file
@@ -1,23 +1,27 @@
+import argparse
 import asyncio
 from app.database import engine, Base
 from app.models import Transaction
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
+from sqlalchemy import select, exists
 from datetime import datetime
 
-async def init_db():
-    """初始化数据库"""
+async def init_db(with_sample: bool = False):
+    """初始化数据库，with_sample为True时在空表中添加示例数据"""
     async with engine.begin() as conn:
         # 创建所有表
         await conn.run_sync(Base.metadata.create_all)
         print("数据库表创建成功")
         
+        if not with_sample:
+            return
+        
         # 检查是否已有数据
         async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
         async with async_session() as session:
-            result = await session.execute(select(Transaction).limit(1))
-            if not result.scalars().first():
+            has_rows = (await session.execute(select(exists().select_from(Transaction)))).scalar()
+            if not has_rows:
                 # 添加示例数据
                 sample_transaction = Transaction(
                     user_id="demo_user",
@@ -34,4 +38,7 @@ async def init_db():
                 print("数据库中已有数据，跳过添加示例数据")
 
 if __name__ == "__main__":
-    asyncio.run(init_db())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="初始化数据库")
+    parser.add_argument("--with-sample", action="store_true", help="在空表中添加示例数据（仅用于本地体验）")
+    args = parser.parse_args()
+    asyncio.run(init_db(with_sample=args.with_sample))
\ No newline at end of file